@@ -24,10 +24,13 @@ except ImportError:
 import logging
 import logging.config
 from optparse import OptionParser
+import random
 import signal
 import sys
+import time
 import traceback
 from ..lib import exceptions as ex
+from ..lib import monotonic
 from . import constants
 from . import hosted_engine
 
@@ -71,6 +74,10 @@ class Agent(object):
         try:
             self._log.debug("Running agent")
             errcode = self._run_agent(action, options.host_id)
+            # Only the service is restarted by systemd, a failed cleanup
+            # run from the command line returns right away.
+            if errcode == -99 and action is action_proper:
+                self._wait_before_restart()
 
         except Exception as e:
             self._log.critical("Could not start ha-agent", exc_info=True)
@@ -98,7 +105,8 @@ class Agent(object):
             handler.setFormatter(logging.Formatter(
                 "%(levelname)s:%(name)s:%(message)s"))
             logging.getLogger('').addHandler(handler)
-        except (configparser.Error, ImportError, NameError, TypeError):
+        except (configparser.Error, ImportError, NameError, TypeError,
+                OSError):
             logging.basicConfig(filename='/dev/stdout', filemode='w+',
                                 level=logging.DEBUG)
             log = logging.getLogger("{0}.Agent".format(__name__))
@@ -114,7 +122,10 @@ class Agent(object):
             signal.signal(signum, handler)
 
     def _handle_quit(self, signum, frame):
-        # Remain re-entrant
+        # Python runs this in the main thread between bytecodes, so it is
+        # not subject to async-signal-safety rules, but it must not take
+        # any lock the interrupted code may hold. A plain attribute
+        # assignment is atomic and keeps the handler re-entrant.
         self._shutdown = True
 
     def shutdown_requested(self):
@@ -144,3 +155,20 @@ class Agent(object):
             self._log.error("Trying to restart agent")
 
         return -99
+
+    def _wait_before_restart(self):
+        """
+        Delays the exit after a failure by a random amount of time.
+
+        The agent is restarted by systemd after a fixed delay, so agents
+        of all hosts failing on the same broker or storage outage would
+        otherwise come back in lockstep and hit the shared storage
+        together.
+        """
+        delay = random.uniform(0, constants.AGENT_RESTART_MAX_JITTER_SECS)
+        self._log.info("Waiting %.1f seconds before restarting", delay)
+        deadline = monotonic.time() + delay
+        remaining = delay
+        while not self._shutdown and remaining > 0:
+            time.sleep(min(1, remaining))
+            remaining = deadline - monotonic.time()
@@ -684,10 +684,10 @@ class HostedEngine(object):
         # Timestamp of the latest vm.conf correct refresh
         tokens.append(self._config.vm_conf_refresh_time)
 
-        data = ("|".join(str(t) for t in tokens)).encode()
-        crc32 = metadata.CRC32_FORMAT % (binascii.crc32(data) & 0xffffffff)
-        tokens[9] = crc32
-        data = "|".join(str(t) for t in tokens)
+        tokens = [str(t) for t in tokens]
+        crc32 = binascii.crc32("|".join(tokens).encode()) & 0xffffffff
+        tokens[9] = metadata.CRC32_FORMAT % crc32
+        data = "|".join(tokens)
 
         if len(data) > constants.METADATA_BLOCK_BYTES:
             raise Exception("Output metadata too long ({0} bytes)"
@@ -78,6 +78,7 @@ class Broker(object):
         self._listener.clean_up()
         self._monitor_instance.stop_all_submonitors()
         self._status_broker_instance.clean_up()
+        self._storage_broker_instance.close()
         sys.exit(0)
 
     def _initialize_logging(self):
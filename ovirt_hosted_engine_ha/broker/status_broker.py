@@ -21,6 +21,7 @@ import collections
 import errno
 import logging
 import os
+import random
 import signal
 import threading
 import time
@@ -31,6 +32,34 @@ from ..broker import constants as broker_constants
 from ..lib import exceptions as ex
 
 
+_LOCK_ACQUIRED = 'acquired'
+_LOCK_FAILED = 'failed'
+_LOCK_RETRY = 'retry'
+
+# sanlock.add_lockspace() errno -> (log level, message, action)
+_ADD_LOCKSPACE_ERRORS = {
+    errno.EEXIST: (logging.DEBUG,
+                   "Host already holds lock",
+                   _LOCK_ACQUIRED),
+    errno.EINVAL: (logging.ERROR,
+                   "cannot get lock on host id {host_id}: host already"
+                   " holds lock on a different host id",
+                   _LOCK_FAILED),
+    errno.EINTR: (logging.WARNING,
+                  "cannot get lock on host id {host_id}: sanlock operation"
+                  " interrupted (will retry)",
+                  _LOCK_RETRY),
+    errno.EINPROGRESS: (logging.WARNING,
+                        "cannot get lock on host id {host_id}: sanlock"
+                        " operation in progress (will retry)",
+                        _LOCK_RETRY),
+    errno.ENOENT: (logging.WARNING,
+                   "cannot get lock on host id {host_id}: the lock file"
+                   " '{lease_file}' is missing (will retry)",
+                   _LOCK_RETRY),
+}
+
+
 class StatusBroker(object):
     StateEntry = collections.namedtuple("StateEntry", ["host_id", "data"])
 
@@ -122,6 +151,9 @@ class StatusBroker(object):
 
     def clean_up(self):
         self._state_update_thread.stop()
+        # The storage broker is closed after this, so the thread must
+        # not be in the middle of a read or write any more.
+        self._state_update_thread.join()
         self.release_host_id()
 
     @property
@@ -178,8 +210,8 @@ class StatusBroker(object):
         """
         raw_state = self._state_update_thread.state
 
-        for host_id in sorted(raw_state.keys()):
-            self._current_state[str(host_id)] = raw_state.get(host_id)
+        self._current_state.update(
+            (str(host_id), data) for host_id, data in raw_state.items())
         return self._current_state
 
     def put_stats(self, data, host_id=None):
@@ -204,6 +236,7 @@ class StatusBroker(object):
                       broker_constants.LOCKSPACE_NAME, self.host_id,
                       self._lease_file)
 
+        delay = broker_constants.WAIT_FOR_STORAGE_DELAY
         for attempt in range(broker_constants.WAIT_FOR_STORAGE_RETRY):
             try:
                 sanlock.add_lockspace(
@@ -212,42 +245,30 @@ class StatusBroker(object):
                     self._lease_file
                 )
             except sanlock.SanlockException as e:
-                if hasattr(e, 'errno'):
-                    if e.errno == errno.EEXIST:
-                        self._log.debug("Host already holds lock")
+                handler = _ADD_LOCKSPACE_ERRORS.get(getattr(e, 'errno', None))
+                if handler is not None:
+                    level, msg, action = handler
+                    self._log.log(level, msg.format(
+                        host_id=self.host_id, lease_file=self._lease_file))
+                    if action == _LOCK_ACQUIRED:
                         break
-                    elif e.errno == errno.EINVAL:
-                        self._log.error(
-                            "cannot get lock on host id {0}: "
-                            "host already holds lock on a different"
-                            " host id"
-                            .format(self.host_id))
-                        raise  # this shouldn't happen, so throw the exception
-                    elif e.errno == errno.EINTR:
-                        self._log.warn("cannot get lock on host id {0}:"
-                                       " sanlock operation interrupted"
-                                       " (will retry)"
-                                       .format(self.host_id))
-                    elif e.errno == errno.EINPROGRESS:
-                        self._log.warn("cannot get lock on host id {0}:"
-                                       " sanlock operation in progress"
-                                       "(will retry)"
-                                       .format(self.host_id))
-                    elif e.errno == errno.ENOENT:
-                        self._log.warn("cannot get lock on host id {0}:"
-                                       " the lock file '{1}' is missing"
-                                       "(will retry)"
-                                       .format(self.host_id, self._lease_file))
+                    elif action == _LOCK_FAILED:
+                        # this shouldn't happen, so throw the exception
+                        raise
             else:  # no exception, we acquired the lock
                 self._log.info("Acquired lock on host id %d", self.host_id)
                 break
 
             # some temporary problem has occurred (usually waiting for
-            # the storage), so wait a while and try again
-            self._log.info("Failed to acquire the lock. Waiting '{0}'s before"
-                           " the next attempt".
-                           format(broker_constants.WAIT_FOR_STORAGE_DELAY))
-            time.sleep(broker_constants.WAIT_FOR_STORAGE_DELAY)
+            # the storage), so wait a while and try again. The wait grows
+            # with every attempt and is randomized, so the hosts do not
+            # all retry at the same time after a shared storage outage.
+            wait = delay * (0.5 + random.random())
+            self._log.info("Failed to acquire the lock. Waiting '{0:.1f}'s"
+                           " before the next attempt".format(wait))
+            time.sleep(wait)
+            delay = min(broker_constants.WAIT_FOR_STORAGE_MAX_DELAY,
+                        delay * 1.5)
         else:  # happens only if all attempts are exhausted
             raise ex.SanlockInitializationError(
                 "Failed to initialize sanlock, the number of errors has"
@@ -34,7 +34,9 @@ from ..lib import monotonic
 from ..lib import exceptions as ex
 from ..lib.storage_backends import FilesystemBackend, VdsmBackend
 from ..lib.storage_backends import StorageBackendTypes
-from ..lib.util import aligned_buffer, connect_vdsm_json_rpc, uninterruptible
+from ..lib.util import aligned_buffer, new_aligned_buffer
+from ..lib.util import connect_vdsm_json_rpc
+from ..lib.util import pread_into, uninterruptible
 
 from vdsm.client import ServerError
 
@@ -55,6 +57,14 @@ class StorageBroker(object):
         self._log = logging.getLogger("{}.StorageBroker".format(__name__))
         self._config = config.Config(logger=self._log)
         self._storage_access_lock = threading.Lock()
+        self._fd_cache = {}
+
+        # Page aligned buffers for direct I/O, reused by all reads and
+        # writes. They are only used under _storage_access_lock.
+        # TODO it would be better if the scanned size was configurable
+        self._read_buf = new_aligned_buffer(
+            constants.HOST_SEGMENT_BYTES * (constants.MAX_HOST_ID_SCAN + 1))
+        self._write_buf = new_aligned_buffer(constants.HOST_SEGMENT_BYTES)
 
         self._service_space = broker_constants.MD_IMAGE
         self._lock_space = broker_constants.LOCKSPACE_IMAGE
@@ -95,6 +105,10 @@ class StorageBroker(object):
             self._backend = VdsmBackend(self.sp_uuid, self.sd_uuid,
                                         self.dom_type, **devices)
             self._backend.connect()
+            # The volume paths do not change once the backend is
+            # connected, resolve them only once.
+            self._svc_paths = dict((service, self._backend.filename(service))
+                                   for service in devices)
         except Exception as _ex:
             self._log.warn("Can't connect vdsm storage: {0} "
                            .format(str(_ex)))
@@ -117,12 +131,8 @@ class StorageBroker(object):
         Reads all files in storage_dir for the given service_type, returning a
         space-delimited string of "<host_id>=<hex data>" for each host.
         """
-        d = self.get_raw_stats()
-        result = {}
-
-        for host_id in sorted(d.keys()):
-            result[str(host_id)] = xmlrpc_client.Binary(d.get(host_id))
-        return result
+        return {str(host_id): xmlrpc_client.Binary(data)
+                for host_id, data in self.get_raw_stats().items()}
 
     def get_raw_stats(self):
         """
@@ -132,55 +142,38 @@ class StorageBroker(object):
         Note: this method is called from the client as well as from
         self.get_all_stats_for_service_type().
         """
-        path, offset = self._backend.filename(self._service_space)
+        path, offset = self._svc_paths[self._service_space]
         self._log.debug("Getting stats for service %s from %s with"
                         " offset %d",
                         self._service_space, path, offset)
 
         bs = constants.HOST_SEGMENT_BYTES
-        # TODO it would be better if this was configurable
-        read_size = bs * (constants.MAX_HOST_ID_SCAN + 1)
-
-        fin = None
-
-        with self._storage_access_lock,\
-                aligned_buffer(read_size) as direct_io_buffer:
 
+        with self._storage_access_lock:
             try:
-                # Use direct I/O if possible, to avoid the local filesystem
-                # cache from hiding metadata file updates from other hosts.
-                direct_flag = (os.O_DIRECT
-                               if self._backend.direct_io else 0)
-
-                f = os.open(path, direct_flag | os.O_RDONLY | os.O_SYNC)
-                os.lseek(f, offset, os.SEEK_SET)
-
-                fin = os.fdopen(f, 'rb', 0)  # 0 disables unneeded buffer
-                fin.readinto(direct_io_buffer)
                 # due to direct IO we can only read as bytes
-                bdata = direct_io_buffer.read(read_size)
-                # TODO: fix for IDNA hostnames
-                data = bdata.decode()
-
-            except UnicodeDecodeError as e:
-                self._log.error("Corrupted metadata from %s",
-                                path, exc_info=True)
-                raise ex.RequestError("Corrupted read metadata: {0}"
-                                      .format(str(e)))
+                bdata = self._read_direct(path, offset, self._read_buf)
 
             except EnvironmentError as e:
                 self._log.error("Failed to read metadata from %s",
                                 path, exc_info=True)
+                self._drop_fd(path)
                 raise ex.RequestError("failed to read metadata: {0}"
                                       .format(str(e)))
-            finally:
-                # Cleanup
-                if fin:
-                    fin.close()
 
-        return dict(((i // bs, data[i:i + bs])
-                     for i in range(0, len(data), bs)
-                     if data[i] != '\0'))
+        # Most of the scanned segments belong to unused host ids, so test
+        # the first byte of every segment on the raw buffer and decode
+        # only the segments that actually hold data.
+        try:
+            # TODO: fix for IDNA hostnames
+            return dict(((i // bs, bdata[i:i + bs].decode())
+                         for i in range(0, len(bdata), bs)
+                         if bdata[i:i + 1] != b'\0'))
+        except UnicodeDecodeError as e:
+            self._log.error("Corrupted metadata from %s",
+                            path, exc_info=True)
+            raise ex.RequestError("Corrupted read metadata: {0}"
+                                  .format(str(e)))
 
     def put_stats(self, host_id, data):
         """
@@ -188,14 +181,14 @@ class StorageBroker(object):
         storing the hex string data (e.g. 01bc4f[...]) in binary format.
         Data is written at offset 4KiB*host_id.
 
-        In theory, NFS write block sizes and close-to-open cache coherency
-        let us get away with with propagating metadata updates through a
-        segment of a file shared with other clients who update adjacent
-        segments, so long as a) the writes don't overlap, and b) we close
-        the file after the write.
+        In theory, NFS write block sizes and direct I/O let us get away
+        with propagating metadata updates through a segment of a file
+        shared with other clients who update adjacent segments, so long
+        as a) the writes don't overlap, and b) the writes bypass the
+        client cache, which is why the file can stay open between writes.
         """
         host_id = int(host_id)
-        path, offset = self._backend.filename(self._service_space)
+        path, offset = self._svc_paths[self._service_space]
         offset += host_id * constants.HOST_SEGMENT_BYTES
         self._log.debug("Writing stats for service %s, host id %d"
                         " to file %s, offset %d",
@@ -204,31 +197,92 @@ class StorageBroker(object):
         byte_data = data.data
         byte_data = byte_data.ljust(constants.HOST_SEGMENT_BYTES, b'\0')
 
-        with self._storage_access_lock,\
-                aligned_buffer(len(byte_data)) as direct_io_buffer:
-            f = None
-
+        with self._storage_access_lock:
             try:
-                direct_flag = (os.O_DIRECT
-                               if self._backend.direct_io else 0)
-
-                f = os.open(path, direct_flag | os.O_WRONLY | os.O_SYNC)
-                os.lseek(f, offset, os.SEEK_SET)
-
-                direct_io_buffer.write(byte_data)
-                uninterruptible(os.write, f, direct_io_buffer)
+                if len(byte_data) == len(self._write_buf):
+                    self._write_buf[:] = byte_data
+                    self._write_direct(path, offset, self._write_buf)
+                else:
+                    # oversized data, does not fit the shared buffer
+                    with aligned_buffer(len(byte_data)) as direct_io_buffer:
+                        direct_io_buffer.write(byte_data)
+                        self._write_direct(path, offset, direct_io_buffer)
 
             except EnvironmentError as e:
                 self._log.error("Failed to write metadata for host %d to %s",
                                 host_id, path, exc_info=True)
+                self._drop_fd(path)
                 raise ex.RequestError("failed to write metadata: {0}"
                                       .format(str(e)))
-            finally:
-                if f:
-                    os.close(f)
 
         self._log.debug("Finished")
 
+    def _get_fd(self, path):
+        """
+        Returns a read-write file descriptor for path. The descriptor is
+        opened on first use and shared by all subsequent reads and writes.
+        Callers must hold _storage_access_lock.
+        """
+        fd = self._fd_cache.get(path)
+        if fd is None:
+            # Use direct I/O if possible, to avoid the local filesystem
+            # cache from hiding metadata file updates from other hosts.
+            flags = os.O_RDWR | os.O_SYNC
+            if self._backend.direct_io:
+                flags |= os.O_DIRECT
+            fd = os.open(path, flags)
+            self._fd_cache[path] = fd
+        return fd
+
+    def _drop_fd(self, path):
+        """
+        Closes and forgets the cached descriptor for path, so the next
+        access opens the file again (e.g. after the volume was prepared
+        again or the NFS file handle became stale).
+        Callers must hold _storage_access_lock.
+        """
+        fd = self._fd_cache.pop(path, None)
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def close(self):
+        """
+        Closes all cached file descriptors and releases the I/O buffers.
+        Called on broker shutdown.
+        """
+        with self._storage_access_lock:
+            for path in list(self._fd_cache):
+                self._drop_fd(path)
+            self._read_buf.close()
+            self._write_buf.close()
+
+    def _read_direct(self, path, offset, direct_io_buffer):
+        """
+        Fills direct_io_buffer with the content of path starting at
+        offset and returns the bytes actually read.
+
+        The whole host segment area is fetched with a single positioned
+        read on a cached descriptor, so a sweep over all hosts costs one
+        syscall. Callers must hold _storage_access_lock.
+        """
+        fd = self._get_fd(path)
+        read = uninterruptible(pread_into, fd, direct_io_buffer, offset)
+        # Slicing copies straight out of the mapping and, unlike read(),
+        # leaves the buffer position alone.
+        return direct_io_buffer[:read]
+
+    def _write_direct(self, path, offset, direct_io_buffer):
+        """
+        Writes the whole direct_io_buffer to path at offset using a
+        positioned write on a cached descriptor.
+        Callers must hold _storage_access_lock.
+        """
+        fd = self._get_fd(path)
+        uninterruptible(os.pwrite, fd, direct_io_buffer, offset)
+
     def get_image_path(self, service):
         """
         Returns the full path to a file or device that holds the data
@@ -236,7 +290,7 @@ class StorageBroker(object):
 
         Client ID is provided by the broker logic.
         """
-        return self._backend.filename(service)[0]
+        return self._svc_paths[service][0]
 
     def get_sector_size(self):
         return self._backend.sector_size()
@@ -260,12 +314,17 @@ class StorageBroker(object):
             self._log.info("Started VDSM domain monitor for %s", self.sd_uuid)
             dm_status = self._get_domain_monitor_status()
 
-        waited = 0
+        # Poll often at first, so a quick acquisition is noticed right away,
+        # and back off to avoid flooding VDSM while the lease is pending.
+        delay = broker_constants.DOMAIN_MONITOR_POLL_MIN_DELAY
+        deadline = (monotonic.time() +
+                    broker_constants.MAX_DOMAIN_MONITOR_WAIT_SECS)
         while dm_status != self.DomainMonitorStatus.ACQUIRED \
-                and waited <= broker_constants.MAX_DOMAIN_MONITOR_WAIT_SECS:
-            waited += 5
-            time.sleep(5)
+                and monotonic.time() < deadline:
+            time.sleep(delay)
             dm_status = self._get_domain_monitor_status()
+            delay = min(broker_constants.DOMAIN_MONITOR_POLL_MAX_DELAY,
+                        delay * 1.5)
 
         if dm_status == self.DomainMonitorStatus.ACQUIRED:
             self._log.debug("VDSM is monitoring domain %s", self.sd_uuid)
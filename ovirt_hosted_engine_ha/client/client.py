@@ -17,6 +17,7 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 #
 
+from contextlib import contextmanager
 import logging
 
 from ..env import config, config_constants
@@ -28,6 +29,31 @@ from ..lib import util
 from ..lib.exceptions import MetadataError
 
 
+class _BrokerBatch(object):
+    """
+    Broker operations sharing a single BrokerLink. The metadata is read
+    from the broker once and reused by all later calls of the batch.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._stats = None
+
+    def get_stats(self):
+        """
+        Returns the raw stats as {host_id: data}, reading them from the
+        broker on the first call only.
+        """
+        if self._stats is None:
+            self._stats = self.broker.get_stats_from_storage()
+        return self._stats
+
+    def put_stats(self, host_id, data):
+        self.broker.put_stats_on_storage(host_id, data)
+        if self._stats is not None:
+            self._stats[host_id] = data
+
+
 class HAClient(object):
     class StatModes(object):
         """
@@ -68,6 +94,33 @@ class HAClient(object):
                                 level=logging.CRITICAL)
         self._log = logging.getLogger("{}.HAClient".format(__name__))
         self._config = None
+        self._global_md_cache = (None, None)
+
+    @contextmanager
+    def batch(self, timeout=None):
+        """
+        Context manager yielding an object with get_stats() and
+        put_stats() methods, which share one broker link and one read
+        of the metadata. Use it to amortize the broker round-trips when
+        doing several updates in a row:
+
+            with client.batch() as b:
+                client.set_global_md_flag(flag1, value1, batch=b)
+                client.set_global_md_flag(flag2, value2, batch=b)
+        """
+        yield _BrokerBatch(brokerlink.BrokerLink(timeout=timeout))
+
+    def _parse_global_md(self, block):
+        """
+        Parses the global metadata block, reusing the result of the
+        previous call if the block did not change since. Returns a new
+        dict which the caller is free to modify.
+        """
+        cached_block, md_dict = self._global_md_cache
+        if block != cached_block:
+            md_dict = metadata.parse_global_metadata_to_dict(self._log, block)
+            self._global_md_cache = (block, md_dict)
+        return dict(md_dict)
 
     def _check_liveness_metadata(self, md, broker):
         md["live-data"] = broker.is_host_alive(md["host-id"])
@@ -89,12 +142,10 @@ class HAClient(object):
         as {host_id: = {key: value, ...}}
         """
         if self._config is None:
-            self._config = config.Config()
-        broker = brokerlink.BrokerLink(timeout=timeout)
-        stats = broker.get_stats_from_storage()
-
-        stats = self._parse_stats(stats, mode)
-        self._check_liveness_for_stats(stats, broker)
+            self._config = config.get_cached_config()
+        with self.batch(timeout) as b:
+            stats = self._parse_stats(b.get_stats(), mode)
+            self._check_liveness_for_stats(stats, b.broker)
         return stats
 
     def get_all_stats_direct(self, mode=StatModes.ALL):
@@ -105,7 +156,10 @@ class HAClient(object):
         from ..broker import storage_broker
 
         sb = storage_broker.StorageBroker()
-        stats = sb.get_raw_stats()
+        try:
+            stats = sb.get_raw_stats()
+        finally:
+            sb.close()
 
         return self._parse_stats(stats, mode)
 
@@ -122,20 +176,24 @@ class HAClient(object):
         callers to detect a parsing error.
         """
         output = {}
+        if mode != self.StatModes.HOST and 0 in stats:
+            try:
+                output[0] = self._parse_global_md(stats[0])
+            except MetadataError as e:
+                self._log.error(str(e))
+
+        if mode == self.StatModes.GLOBAL:
+            return output
+
         for host_id, data in stats.items():
+            if host_id == 0:
+                continue
             try:
-                if host_id == 0 and mode != self.StatModes.HOST:
-                    md = metadata.parse_global_metadata_to_dict(self._log,
-                                                                data)
-                    output[0] = md
-                elif host_id != 0 and mode != self.StatModes.GLOBAL:
-                    md = metadata.parse_metadata_to_dict(host_id, data)
-                    output[md['host-id']] = md
-                else:
-                    continue
+                md = metadata.parse_metadata_to_dict(host_id, data)
             except MetadataError as e:
                 self._log.error(str(e))
                 continue
+            output[md['host-id']] = md
         return output
 
     def get_all_host_stats(self, timeout=None):
@@ -152,12 +210,19 @@ class HAClient(object):
         """
         return self.get_all_stats_direct(self.StatModes.HOST)
 
-    def set_global_md_flag(self, flag, value, timeout=None):
+    def set_global_md_flag(self, flag, value, timeout=None, batch=None):
         """
         Connects to HA broker and sets flags in global metadata, leaving
         any other flags unaltered.  On error, exceptions will be propagated
         to the caller.
+        If batch (see batch()) is given, its broker link and stats are
+        used and timeout is ignored.
         """
+        if batch is None:
+            with self.batch(timeout) as b:
+                self.set_global_md_flag(flag, value, batch=b)
+            return
+
         try:
             transform_fn = metadata.global_flags[flag]
         except KeyError:
@@ -170,14 +235,10 @@ class HAClient(object):
         else:
             put_val = value
 
-        broker = brokerlink.BrokerLink(timeout=timeout)
-        all_stats = broker.get_stats_from_storage()
-
-        global_stats = all_stats.get(0)
+        global_stats = batch.get_stats().get(0)
         if global_stats and len(global_stats):
             try:
-                md_dict = metadata.parse_global_metadata_to_dict(
-                    self._log, global_stats)
+                md_dict = self._parse_global_md(global_stats)
             except Exception:
                 self._log.warn("Metadata block corrupted. Correcting.")
                 md_dict = {}
@@ -186,35 +247,39 @@ class HAClient(object):
 
         md_dict[flag] = put_val
         block = metadata.create_global_metadata_from_dict(md_dict)
-        broker.put_stats_on_storage(0, block)
+        batch.put_stats(0, block)
+        # md_dict holds the transformed input values, not what parsing the
+        # block gives back, so cache the parsed block instead.
+        self._global_md_cache = (
+            block, metadata.parse_global_metadata_to_dict(self._log, block))
 
     def get_local_host_id(self):
         if self._config is None:
-            self._config = config.Config()
+            self._config = config.get_cached_config()
 
         host_id = self._config.get(config.ENGINE, config_constants.HOST_ID)
         return int(host_id) if host_id else None
 
     def get_local_host_score(self, timeout=None):
         if self._config is None:
-            self._config = config.Config()
+            self._config = config.get_cached_config()
 
         host_id = int(self._config.get(config.ENGINE,
                                        config_constants.HOST_ID))
-        broker = brokerlink.BrokerLink(timeout=timeout)
-        stats = broker.get_stats_from_storage()
-
         score = 0
-        if host_id in stats:
-            try:
-                md = metadata.parse_metadata_to_dict(host_id, stats[host_id])
-            except MetadataError as e:
-                self._log.error(str(e))
-            else:
-                # Only report a non-zero score if the local host has had a
-                # recent update.
-                if self._check_liveness_metadata(md, broker):
-                    score = md['score']
+        with self.batch(timeout) as b:
+            stats = b.get_stats()
+            if host_id in stats:
+                try:
+                    md = metadata.parse_metadata_to_dict(host_id,
+                                                         stats[host_id])
+                except MetadataError as e:
+                    self._log.error(str(e))
+                else:
+                    # Only report a non-zero score if the local host has
+                    # had a recent update.
+                    if self._check_liveness_metadata(md, b.broker):
+                        score = md['score']
 
         return score
 
@@ -236,13 +301,13 @@ class HAClient(object):
 
         elif mode == self.MaintenanceMode.LOCAL:
             if self._config is None:
-                self._config = config.Config()
+                self._config = config.get_cached_config()
             self._config.set(config.HA,
                              config_constants.LOCAL_MAINTENANCE,
                              str(util.to_bool(value)))
         elif mode == self.MaintenanceMode.LOCAL_MANUAL:
             if self._config is None:
-                self._config = config.Config()
+                self._config = config.get_cached_config()
             self._config.set(config.HA,
                              config_constants.LOCAL_MAINTENANCE_MANUAL,
                              str(util.to_bool(value)))
@@ -255,22 +320,22 @@ class HAClient(object):
 
     def set_shared_config(self, key, value, config_type=None):
         if self._config is None:
-            self._config = config.Config()
+            self._config = config.get_cached_config()
         self._config.set_config_on_shared_storage(key, value, config_type)
 
     def get_shared_config(self, key, config_type=None):
         if self._config is None:
-            self._config = config.Config()
+            self._config = config.get_cached_config()
         return self._config.get_config_from_shared_storage(key, config_type)
 
     def get_all_config_keys(self, config_type=None):
         if self._config is None:
-            self._config = config.Config()
+            self._config = config.get_cached_config()
         return self._config.get_all_shared_keys(config_type)
 
     def reset_lockspace(self, force=False, timeout=None):
         if self._config is None:
-            self._config = config.Config()
+            self._config = config.get_cached_config()
 
         host_id = self._config.get(config.ENGINE, config_constants.HOST_ID)
         is_configured = self._config.get(config.ENGINE,
@@ -0,0 +1,59 @@
+import mock
+from unittest import TestCase
+
+from . import client
+
+
+class _BrokerLinkMock(object):
+    """
+    Keeps the stats in a dict shared by all links, like the broker does.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def get_stats_from_storage(self):
+        return dict(self._storage)
+
+    def put_stats_on_storage(self, host_id, data):
+        self._storage[host_id] = data
+
+
+class HAClientTest(TestCase):
+
+    def setUp(self):
+        self.storage = {}
+        patchers = [
+            mock.patch.object(
+                client.brokerlink, 'BrokerLink',
+                side_effect=lambda timeout=None: _BrokerLinkMock(
+                    self.storage)),
+            mock.patch.object(client.config, 'get_cached_config'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_set_global_md_flag_then_get_stats(self):
+        ha_client = client.HAClient()
+        ha_client.set_global_md_flag('maintenance', 'true')
+
+        expected = {0: {'maintenance': True}}
+        # the same client reads the block it has just written
+        self.assertEqual(
+            ha_client.get_all_stats(client.HAClient.StatModes.GLOBAL),
+            expected)
+        self.assertEqual(
+            client.HAClient().get_all_stats(
+                client.HAClient.StatModes.GLOBAL),
+            expected)
+
+    def test_set_global_md_flag_in_batch(self):
+        ha_client = client.HAClient()
+        with ha_client.batch() as b:
+            ha_client.set_global_md_flag('maintenance', 'true', batch=b)
+            ha_client.set_global_md_flag('maintenance', 'false', batch=b)
+
+        self.assertEqual(
+            ha_client.get_all_stats(client.HAClient.StatModes.GLOBAL),
+            {0: {'maintenance': False}})
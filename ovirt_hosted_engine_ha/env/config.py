@@ -18,6 +18,8 @@
 #
 
 import logging
+import os
+import threading
 
 from ovirt_hosted_engine_ha.env.config_ini import SharedIniFile
 from .config_file import ConfigFile
@@ -27,6 +29,10 @@ from . import constants
 from .config_constants import ENGINE, CONF_FILE, BROKER, HE_CONF, VM, HA,\
     LEGACY_VM_CONF, ENGINE_OPTIONAL_KEYS
 
+_cached_config = None
+_cached_config_key = None
+_cached_config_lock = threading.Lock()
+
 
 class Config(object):
     def __init__(self, logger=None):
@@ -214,3 +220,36 @@ class Config(object):
         self._config_map[cfg].download()
         self._config_map[cfg].load()
         return self._config_map[cfg].path
+
+
+def _config_files_key(cfg):
+    """
+    Returns a key describing the current state of the local files
+    backing cfg, changing whenever any of them is modified.
+    """
+    key = []
+    for cfg_file in cfg.config_files:
+        try:
+            st = os.stat(cfg_file.path)
+        except OSError:
+            key.append((cfg_file.path, None))
+        else:
+            key.append((cfg_file.path, st.st_mtime_ns, st.st_size))
+    return tuple(key)
+
+
+def get_cached_config():
+    """
+    Returns a Config instance shared by all the callers in this process.
+    The configuration is parsed again only when one of its local files
+    changed since the last call.
+    """
+    global _cached_config, _cached_config_key
+
+    with _cached_config_lock:
+        if (_cached_config is None or
+                _config_files_key(_cached_config) != _cached_config_key):
+            _cached_config = Config()
+            _cached_config_key = _config_files_key(_cached_config)
+
+        return _cached_config
@@ -0,0 +1,46 @@
+import mock
+import os
+import tempfile
+from unittest import TestCase
+
+from . import config
+
+
+class GetCachedConfigTest(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+
+        def new_config():
+            cfg = mock.Mock()
+            cfg.config_files = [mock.Mock(path=self.path)]
+            return cfg
+
+        patchers = [
+            mock.patch.object(config, '_cached_config', None),
+            mock.patch.object(config, '_cached_config_key', None),
+            mock.patch.object(config, 'Config', side_effect=new_config),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_reused_while_files_unchanged(self):
+        cfg = config.get_cached_config()
+        self.assertIs(config.get_cached_config(), cfg)
+        self.assertEqual(config.Config.call_count, 1)
+
+    def test_reloaded_when_file_changes(self):
+        cfg = config.get_cached_config()
+        with open(self.path, 'w') as f:
+            f.write('changed')
+
+        new_cfg = config.get_cached_config()
+        self.assertIsNot(new_cfg, cfg)
+        self.assertEqual(config.Config.call_count, 2)
+
+        # only the configuration of the current files is kept
+        self.assertIs(config.get_cached_config(), new_cfg)
+        self.assertEqual(config.Config.call_count, 2)
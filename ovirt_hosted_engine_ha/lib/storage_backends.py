@@ -86,13 +86,33 @@ class StorageBackend(with_metaclass(ABCMeta, object)):
         if dom_type == 'glusterfs':
             parent = os.path.join(parent, 'glusterSD')
 
-        for dname in os.listdir(parent):
-            path = os.path.join(parent, dname, sd_uuid)
-            if os.access(path, os.F_OK):
-                return path, dname == "blockSD"
+        # scandir() gets the entry types from readdir, so files in the
+        # mount parent are skipped without a stat call per entry
+        with os.scandir(parent) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                path = os.path.join(entry.path, sd_uuid)
+                if os.access(path, os.F_OK):
+                    return path, entry.name == "blockSD"
         raise BackendFailureException("path to storage domain {0} not found"
                                       " in {1}".format(sd_uuid, parent))
 
+    def _resolve_storage_path(self):
+        """
+        Looks up the storage domain and sets the path of the directory
+        holding the service volumes or links to them. A path found
+        earlier is reused as long as the storage domain is still there.
+        """
+        if (self._storage_path is not None and
+                os.access(os.path.dirname(self._storage_path), os.F_OK)):
+            return
+
+        base_path, self._lv_based = self.get_domain_path(self._sd_uuid,
+                                                         self._dom_type)
+        self._storage_path = os.path.join(base_path,
+                                          constants.SD_METADATA_DIR)
+
     def set_external_logger(self, extlogger):
         """
         Let the consumer pass an external logger
@@ -101,6 +121,14 @@ class StorageBackend(with_metaclass(ABCMeta, object)):
             self._logger = extlogger
 
     def _check_symlinks(self, storage_path, volume_path, service_link):
+        try:
+            if os.readlink(service_link) == volume_path:
+                # the link is already in place, e.g. on a reconnect
+                return
+        except OSError:
+            # missing or not a link, recreate it below
+            pass
+
         try:
             os.unlink(service_link)
             self._logger.info("Cleaning up stale LV link '%s'", service_link)
@@ -177,6 +205,8 @@ class VdsmBackend(StorageBackend):
         self._sd_uuid = sd_uuid
         self._dom_type = dom_type
         self._sector_size = None
+        self._lv_based = False
+        self._storage_path = None
 
     def _get_volume_path(self, connection, spUUID, sdUUID, imgUUID, volUUID):
         retval = namedtuple('retval', ['status_code', 'path', 'message'])
@@ -316,29 +346,25 @@ class VdsmBackend(StorageBackend):
             raise RuntimeError(response.message)
 
         # Clear the volume (VDSM does not do that automatically for iSCSI)
-        # use 10KiB blocks to do the writing
-        BLOCK_SIZE = 10240
-        # Find out file size by opening it and seeking till the end.
-        # Works on regular files, block devices, symlinks to them etc.
-        fd = os.open(response.path, os.O_RDONLY)
+        # write 1MiB of zeros per call straight to the descriptor, reusing
+        # the same buffer for all the writes
+        BLOCK_SIZE = 1024 * 1024
+        fd = os.open(response.path, os.O_WRONLY)
         try:
-            remaining_size = os.lseek(fd, 0, os.SEEK_END)
+            # Find out file size by seeking till the end. Works on regular
+            # files, block devices, symlinks to them etc.
+            size = os.lseek(fd, 0, os.SEEK_END)
+            zeros = memoryview(b'\0' * min(BLOCK_SIZE, size))
+            offset = 0
+            while offset < size:
+                offset += os.pwrite(fd, zeros[:size - offset], offset)
         finally:
             os.close(fd)
-        with open(response.path, 'r+') as of:
-            while remaining_size > 0:
-                of.write('\0' * (BLOCK_SIZE if remaining_size > BLOCK_SIZE
-                                 else remaining_size))
-                remaining_size -= BLOCK_SIZE
-            of.flush()
 
         return True, response.path
 
     def create(self, service_map, force_new=False):
-        base_path, self._lv_based = self.get_domain_path(self._sd_uuid,
-                                                         self._dom_type)
-        self._storage_path = os.path.join(base_path,
-                                          constants.SD_METADATA_DIR)
+        self._resolve_storage_path()
 
         util.mkdir_recursive(self._storage_path)
 
@@ -372,12 +398,9 @@ class VdsmBackend(StorageBackend):
         if initialize:
             self._logger.info("Connecting the storage")
             sserver = storage_server.StorageServer()
-            sserver.connect_storage_server()
+            sserver.connect_storage_server(cli=connection)
 
-        base_path, self._lv_based = self.get_domain_path(self._sd_uuid,
-                                                         self._dom_type)
-        self._storage_path = os.path.join(base_path,
-                                          constants.SD_METADATA_DIR)
+        self._resolve_storage_path()
 
         response = self._get_sector_size(
             connection,
@@ -456,10 +479,7 @@ class FilesystemBackend(StorageBackend):
         return (fname, 0)
 
     def connect(self):
-        base_path, self._lv_based = self.get_domain_path(self._sd_uuid,
-                                                         self._dom_type)
-        self._storage_path = os.path.join(base_path,
-                                          constants.SD_METADATA_DIR)
+        self._resolve_storage_path()
         if not self._lv_based:
             return
 
@@ -619,10 +639,7 @@ class FilesystemBackend(StorageBackend):
                 return False
 
     def create(self, service_map, force_new=False):
-        base_path, self._lv_based = self.get_domain_path(self._sd_uuid,
-                                                         self._dom_type)
-        self._storage_path = os.path.join(base_path,
-                                          constants.SD_METADATA_DIR)
+        self._resolve_storage_path()
 
         util.mkdir_recursive(self._storage_path)
 
@@ -1,6 +1,9 @@
+import os
+import shutil
+import tempfile
 import unittest
 
-from mock import Mock, call
+from mock import Mock, call, patch
 
 from .storage_backends import FilesystemBackend, BackendFailureException
 from ..env import constants
@@ -84,3 +87,40 @@ class TestLVMBackend(unittest.TestCase):
         self.assertEqual(
             [],
             dev.lvzero.mock_calls)
+
+
+class TestCheckSymlinks(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.storage_path = os.path.join(self.tmpdir, "run")
+        self.service_link = os.path.join(self.storage_path, "service")
+        self.volume_path = os.path.join(self.tmpdir, "volume")
+        self.dev = FilesystemBackend("uuid", "type")
+
+    def test_link_in_place(self):
+        os.mkdir(self.storage_path)
+        os.symlink(self.volume_path, self.service_link)
+
+        with patch("os.unlink") as unlink, patch("os.symlink") as symlink:
+            self.dev._check_symlinks(self.storage_path, self.volume_path,
+                                     self.service_link)
+
+        # Test if the link was left alone
+        self.assertEqual([], unlink.mock_calls)
+        self.assertEqual([], symlink.mock_calls)
+
+    def test_stale_link(self):
+        os.mkdir(self.storage_path)
+        os.symlink(os.path.join(self.tmpdir, "old"), self.service_link)
+
+        self.dev._check_symlinks(self.storage_path, self.volume_path,
+                                 self.service_link)
+
+        self.assertEqual(self.volume_path, os.readlink(self.service_link))
+
+    def test_missing_link(self):
+        self.dev._check_symlinks(self.storage_path, self.volume_path,
+                                 self.service_link)
+
+        self.assertEqual(self.volume_path, os.readlink(self.service_link))
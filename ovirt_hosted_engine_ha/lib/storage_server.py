@@ -22,7 +22,9 @@ from ..env import config_constants as const
 from ..env import constants
 from ..env import path as env_path
 from ovirt_hosted_engine_ha.lib import exceptions as ex
+from ovirt_hosted_engine_ha.lib import monotonic
 from ovirt_hosted_engine_ha.lib import util
+import itertools
 import logging
 import os
 import re
@@ -36,13 +38,41 @@ from vdsm.client import ServerError
 
 logger = logging.getLogger(__name__)
 
+# how long the detected iSCSI interfaces are reused
+_ISCSI_IFACES_CACHE_SECS = 5
+
+# how long to wait for 'iscsiadm -m iface'
+_ISCSIADM_TIMEOUT_SECS = 30
+
+# iface records of open-iscsi, as listed by 'iscsiadm -m iface'
+_ISCSI_IFACES_DIR = '/var/lib/iscsi/ifaces'
+
+# <iscsi_ifacename> <transport_name>,<hwaddress>,<ipaddress>,\
+# <net_ifacename>,<initiatorname>
+_ISCSIADM_IFACE_RE = re.compile(
+    "^(?P<iscsi_ifacename>.*) "
+    "tcp,"
+    "(?P<hwaddress>.*),"
+    "(?P<ipaddress>.*),"
+    "(?P<net_ifacename>.*),"
+    "(?P<initiatorname>.*)$"
+)
+
+# storage domain UUID -> path found mounted where expected by
+# _validate_pre_connected_path(), until the next disconnect
+_validated_paths = {}
+
+# (detection time, interfaces) of the last _get_iscsi_ifaces() call,
+# shared by all StorageServer instances
+_iscsi_ifaces_cache = (0, None)
+
 
 class StorageServer(object):
 
     def __init__(self):
         self._log = logging.getLogger("%s.StorageServer" % __name__)
         self._log.addFilter(log_filter.get_intermittent_filter())
-        self._config = config.Config(logger=self._log)
+        self._config = config.get_cached_config()
         self._domain_type = self._config.get(config.ENGINE, const.DOMAIN_TYPE)
         self._spUUID = self._config.get(config.ENGINE, const.SP_UUID)
         self._sdUUID = self._config.get(config.ENGINE, const.SD_UUID)
@@ -52,11 +82,16 @@ class StorageServer(object):
             const.CONNECTIONUUID
         )
 
-        self._iqn = self._config.get(config.ENGINE, const.ISCSI_IQN)
-        self._portal = self._config.get(config.ENGINE, const.ISCSI_PORTAL)
-        self._user = self._config.get(config.ENGINE, const.ISCSI_USER)
-        self._password = self._config.get(config.ENGINE, const.ISCSI_PASSWORD)
-        self._port = self._config.get(config.ENGINE, const.ISCSI_PORT)
+        # iSCSI settings, read by _load_iscsi_config() on first use
+        self._iscsi_config_loaded = False
+        self._iqn = None
+        self._portal = None
+        self._user = None
+        self._password = None
+        # (address, port) pairs of the iSCSI paths
+        self._iscsi_portals = None
+        # set of (iface name, portal address) pairs
+        self._iscsi_paths_blacklist = frozenset()
         self._mnt_options = None
         try:
             self._mnt_options = self._config.get(
@@ -73,20 +108,37 @@ class StorageServer(object):
             )
         except (KeyError, ValueError):
             pass
-        self._iscsi_paths_blacklist = []
+
+    def _load_iscsi_config(self):
+        """
+        Reads the settings only used for iSCSI storage domains, so the
+        other domain types do not pay for them.
+        """
+        if self._iscsi_config_loaded:
+            return
+
+        self._iqn = self._config.get(config.ENGINE, const.ISCSI_IQN)
+        self._portal = self._config.get(config.ENGINE, const.ISCSI_PORTAL)
+        self._user = self._config.get(config.ENGINE, const.ISCSI_USER)
+        self._password = self._config.get(config.ENGINE, const.ISCSI_PASSWORD)
+        port = self._config.get(config.ENGINE, const.ISCSI_PORT)
+        self._iscsi_portals = list(zip(
+            self._storage.split(','),
+            port.split(',')
+        ))
         try:
             iscsi_paths_blacklist_str = self._config.get(
                 config.ENGINE,
                 const.ISCSI_MPATHS_BLACKLIST
             )
             if iscsi_paths_blacklist_str is not None:
-                for t in iscsi_paths_blacklist_str.strip().split(','):
-                    iface_portal = t.split('<>')
-                    self._iscsi_paths_blacklist.append(
-                        (iface_portal[0], iface_portal[1])
-                    )
+                self._iscsi_paths_blacklist = frozenset(
+                    tuple(t.split('<>')[:2])
+                    for t in iscsi_paths_blacklist_str.strip().split(',')
+                )
         except (KeyError, ValueError):
             pass
+        self._iscsi_config_loaded = True
 
     def _get_conlist_nfs_gluster(self):
         conDict = {
@@ -154,11 +206,14 @@ class StorageServer(object):
                      to prevent connecting twice the hosted-engine storage
                      server
         """
+        if _validated_paths.get(self._sdUUID) == path:
+            return
+
         try:
             cli.StorageDomain.getInfo(storagedomainID=self._sdUUID)
         except ServerError:
             self._log.debug(
-                'Storage domain {sd} is not available'.format(sd=self._sdUUID)
+                'Storage domain %s is not available', self._sdUUID
             )
             return
 
@@ -182,57 +237,100 @@ class StorageServer(object):
             self._log.error(msg)
             raise ex.DuplicateStorageConnectionException(msg)
 
-    def _get_iscsi_ifaces(self):
-        self._log.debug("Detecting iSCSI interface")
-        _RESERVED_INTERFACES = ("default", "iser")
-        iscsi_bond_ifaces = []
+        _validated_paths[self._sdUUID] = path
 
-        command = subprocess.Popen(
-            [
-                'sudo',
-                'iscsiadm',
-                '-m',
-                'iface'
-            ],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        output = command.communicate()
-        stdout = output[0].decode()
-        stderr = output[1].decode()
-        rc = command.wait()
-        self._log.debug('rc:\n' + str(rc))
-        self._log.debug('stdout:\n' + str(stdout))
-        self._log.debug('stderr:\n' + str(stderr))
-        if rc == 0:
-            # <iscsi_ifacename> <transport_name>,<hwaddress>,<ipaddress>,\
-            # <net_ifacename>,<initiatorname>
-            iscsiadm_re = re.compile(
-                "^(?P<iscsi_ifacename>.*) "
-                "tcp,"
-                "(?P<hwaddress>.*),"
-                "(?P<ipaddress>.*),"
-                "(?P<net_ifacename>.*),"
-                "(?P<initiatorname>.*)$"
+    def _read_iscsi_iface_records(self):
+        """
+        Reads the iSCSI interfaces straight from the iface records of
+        open-iscsi, avoiding to spawn iscsiadm.
+        :return: a list of (iscsi_ifacename, net_ifacename) tuples of the
+                 tcp interfaces, None if the records cannot be read
+        """
+        ifaces = []
+        try:
+            with os.scandir(_ISCSI_IFACES_DIR) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    record = {}
+                    with open(entry.path) as f:
+                        for line in f:
+                            key, sep, value = line.partition('=')
+                            if sep:
+                                record[key.strip()] = value.strip()
+                    if record.get('iface.transport_name') != 'tcp':
+                        continue
+                    ifaces.append((
+                        record.get('iface.iscsi_ifacename', entry.name),
+                        record.get('iface.net_ifacename') or '<empty>',
+                    ))
+        except (IOError, OSError) as e:
+            self._log.debug('Cannot read iSCSI iface records: %s', e)
+            return None
+        return ifaces
+
+    def _run_iscsiadm_iface(self):
+        """
+        Lists the iSCSI interfaces with iscsiadm.
+        :return: a list of (iscsi_ifacename, net_ifacename) tuples of the
+                 tcp interfaces
+        """
+        try:
+            # subprocess.run() reaps the child itself and has no stdin
+            # pipe unless asked for one
+            result = subprocess.run(
+                ['sudo', 'iscsiadm', '-m', 'iface'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=_ISCSIADM_TIMEOUT_SECS,
             )
+        except subprocess.TimeoutExpired:
+            self._log.warning(
+                'Timed out fetching iSCSI interface list after {t}s'.format(
+                    t=_ISCSIADM_TIMEOUT_SECS
+                )
+            )
+            return []
+        stdout = result.stdout.decode()
+        rc = result.returncode
+        if self._log.isEnabledFor(logging.DEBUG):
+            self._log.debug('rc:\n%s', rc)
+            self._log.debug('stdout:\n%s', stdout)
+            self._log.debug('stderr:\n%s', result.stderr.decode())
+        ifaces = []
+        if rc == 0:
             for line in stdout.splitlines():
-                ifacematch = iscsiadm_re.match(line)
+                ifacematch = _ISCSIADM_IFACE_RE.match(line)
                 if ifacematch is not None:
-                    ifaceName = ifacematch.group('iscsi_ifacename')
-                    netIfaceName = ifacematch.group('net_ifacename')
-                    if (
-                        ifaceName not in _RESERVED_INTERFACES and
-                        netIfaceName != '<empty>'
-                    ):
-                        iscsi_bond_ifaces.append({
-                            'ifaceName': ifaceName,
-                            'netIfaceName': netIfaceName
-                        })
+                    ifaces.append((
+                        ifacematch.group('iscsi_ifacename'),
+                        ifacematch.group('net_ifacename'),
+                    ))
         else:
             self._log.warning(
-                'Failed fetching iSCSI interface list: {e}'.format(e=stderr)
+                'Failed fetching iSCSI interface list: {e}'.format(
+                    e=result.stderr.decode()
+                )
             )
+        return ifaces
+
+    def _get_iscsi_ifaces(self):
+        self._log.debug("Detecting iSCSI interface")
+        _RESERVED_INTERFACES = ("default", "iser")
+        iscsi_bond_ifaces = []
+
+        ifaces = self._read_iscsi_iface_records()
+        if ifaces is None:
+            ifaces = self._run_iscsiadm_iface()
+        for ifaceName, netIfaceName in ifaces:
+            if (
+                ifaceName not in _RESERVED_INTERFACES and
+                netIfaceName != '<empty>'
+            ):
+                iscsi_bond_ifaces.append({
+                    'ifaceName': ifaceName,
+                    'netIfaceName': netIfaceName
+                })
 
         if not iscsi_bond_ifaces:
             self._log.info(
@@ -243,43 +341,52 @@ class StorageServer(object):
                 'ifaceName': None,
                 'netIfaceName': None
             })
-        self._log.debug(
-            'iSCSI interfaces: {i}'.format(i=iscsi_bond_ifaces)
-        )
+        self._log.debug('iSCSI interfaces: %s', iscsi_bond_ifaces)
         return iscsi_bond_ifaces
 
     def _get_conlist_iscsi(self):
+        global _iscsi_ifaces_cache
         storageType = constants.STORAGE_TYPE_ISCSI
         conList = []
-        _iscsi_bond_ifaces = self._get_iscsi_ifaces()
-        ip_port_list = [
-            {'ip': x[0], 'port': x[1]} for x in zip(
-                self._storage.split(','),
-                self._port.split(',')
+        self._load_iscsi_config()
+        # connect and disconnect run back to back during a reconnect, each
+        # with its own StorageServer, so reuse the interfaces found shortly
+        # before
+        now = monotonic.time()
+        detected, ifaces = _iscsi_ifaces_cache
+        if ifaces is None or now - detected > _ISCSI_IFACES_CACHE_SECS:
+            ifaces = self._get_iscsi_ifaces()
+            _iscsi_ifaces_cache = (now, ifaces)
+        # fetch the randomness for all the connection ids at once, this is
+        # what uuid.uuid4() does for a single id
+        random_bytes = os.urandom(16 * len(ifaces) * len(self._iscsi_portals))
+        con_ids = (
+            str(uuid.UUID(bytes=random_bytes[n:n + 16], version=4))
+            for n in range(0, len(random_bytes), 16)
+        )
+        for i, (ip, port) in itertools.product(
+            ifaces,
+            self._iscsi_portals
+        ):
+            bound = (
+                i['netIfaceName'] is not None and
+                i['ifaceName'] is not None
             )
-        ]
-        for i in _iscsi_bond_ifaces:
-            for x in ip_port_list:
-                con = {
-                    'connection': x['ip'],
-                    'iqn': self._iqn,
-                    'tpgt': self._portal,
-                    'user': self._user,
-                    'password': self._password,
-                    'id': str(uuid.uuid4()),
-                    'port': x['port'],
-                }
-                if (
-                    i['netIfaceName'] is not None and
-                    i['ifaceName'] is not None
-                ):
-                    con['netIfaceName'] = i['netIfaceName']
-                    con['ifaceName'] = i['ifaceName']
-                    if (
-                        con['ifaceName'], con['connection']
-                    ) in self._iscsi_paths_blacklist:
-                        continue
-                conList.append(con)
+            if bound and (i['ifaceName'], ip) in self._iscsi_paths_blacklist:
+                continue
+            con = {
+                'connection': ip,
+                'iqn': self._iqn,
+                'tpgt': self._portal,
+                'user': self._user,
+                'password': self._password,
+                'id': next(con_ids),
+                'port': port,
+            }
+            if bound:
+                con['netIfaceName'] = i['netIfaceName']
+                con['ifaceName'] = i['ifaceName']
+            conList.append(con)
         return conList, storageType
 
     def _get_conlist_fc(self):
@@ -317,7 +424,7 @@ class StorageServer(object):
             if target_path is None:
                 conList[0]['connection'] = self._storage
             else:
-                conList[0]['connection'] = env_path.get_mount_target(self._config)[0]
+                conList[0]['connection'] = target_path[0]
         elif self._domain_type == constants.DOMAIN_TYPE_ISCSI:
             conList, storageType = self._get_conlist_iscsi()
         elif self._domain_type == constants.DOMAIN_TYPE_FC:
@@ -333,16 +440,19 @@ class StorageServer(object):
             conList[0]['mnt_options'] = self._mnt_options
         return conList, storageType
 
-    def validate_storage_server(self):
+    def validate_storage_server(self, cli=None):
         """
         Checks the hosted-engine storage domain availability
+        :param cli: a vdsm.client instance to reuse, a new one is
+                    created if None
         :return: True if available, False otherwise
         """
         self._log.info("Validating storage server")
-        cli = util.connect_vdsm_json_rpc(
-            logger=self._log,
-            timeout=constants.VDSCLI_SSL_TIMEOUT
-        )
+        if cli is None:
+            cli = util.connect_vdsm_json_rpc(
+                logger=self._log,
+                timeout=constants.VDSCLI_SSL_TIMEOUT
+            )
         try:
             status = cli.Host.getStorageRepoStats(domains=[self._sdUUID])
         except ServerError as e:
@@ -358,18 +468,22 @@ class StorageServer(object):
             self._log.warn("Hosted-engine storage domain is in invalid state")
         return False
 
-    def connect_storage_server(self, timeout=constants.VDSCLI_SSL_TIMEOUT):
+    def connect_storage_server(self, timeout=constants.VDSCLI_SSL_TIMEOUT,
+                               cli=None):
         """
         Connect the hosted-engine domain storage server
+        :param timeout: timeout of a new vdsm.client connection
+        :param cli: a vdsm.client instance to reuse, a new one is
+                    created if None
         """
         self._log.info("Connecting storage server")
-        cli = util.connect_vdsm_json_rpc(
-            logger=self._log,
-            timeout=timeout,
-        )
+        if cli is None:
+            cli = util.connect_vdsm_json_rpc(
+                logger=self._log,
+                timeout=timeout,
+            )
         conList, storageType = self._get_conlist(cli, normalize_path=True)
         if conList:
-            self._log.info("Connecting storage server")
             try:
                 connections = cli.StoragePool.connectStorageServer(
                     storagepoolID=self._spUUID,
@@ -385,15 +499,13 @@ class StorageServer(object):
 
             connected = False
             failed_paths = []
+            con_by_id = {ce['id']: ce for ce in conList}
             for con in connections:
                 if con['status'] == 0:
                     connected = True
                 else:
                     if len(connections) > 1:
-                        con_details = {}
-                        for ce in conList:
-                            if con['id'] == ce['id']:
-                                con_details = ce
+                        con_details = con_by_id.get(con['id'], {})
                         self._log.warning(
                             (
                                 'A connection path to the storage server is '
@@ -410,11 +522,13 @@ class StorageServer(object):
             if len(
                 failed_paths
             ) > 1 and storageType == constants.STORAGE_TYPE_ISCSI:
-                bl_example = ','.join([
-                    fp['ifaceName'] + '<>' + fp['connection']
+                # only connections bound to an iface carry 'ifaceName',
+                # every connection has a 'connection'
+                bl_example = ','.join(
+                    '{0}<>{1}'.format(fp['ifaceName'], fp['connection'])
                     for fp in failed_paths
-                    if 'ifaceName' in fp and 'connection' in fp
-                ])
+                    if fp.get('ifaceName')
+                )
                 if bl_example:
                     self._log.warning((
                         'Many paths of your iSCSI multipath configurations '
@@ -435,18 +549,25 @@ class StorageServer(object):
         except ServerError as e:
             self._log.debug("Error refreshing storage domain: %s", str(e))
 
-    def disconnect_storage_server(self, timeout=constants.VDSCLI_SSL_TIMEOUT):
+    def disconnect_storage_server(self,
+                                  timeout=constants.VDSCLI_SSL_TIMEOUT,
+                                  cli=None):
         """
         Disconnect the hosted-engine domain storage server
+        :param timeout: timeout of a new vdsm.client connection
+        :param cli: a vdsm.client instance to reuse, a new one is
+                    created if None
         """
         self._log.info("Disconnecting storage server")
-        cli = util.connect_vdsm_json_rpc(
-            logger=self._log,
-            timeout=timeout,
-        )
+        if cli is None:
+            cli = util.connect_vdsm_json_rpc(
+                logger=self._log,
+                timeout=timeout,
+            )
         # normalize_path=False since we want to be sure we really disconnect
         # from where we were connected also if its path was wrong
         conList, storageType = self._get_conlist(cli, normalize_path=False)
+        _validated_paths.pop(self._sdUUID, None)
         if conList:
             try:
                 status = cli.StoragePool.disconnectStorageServer(
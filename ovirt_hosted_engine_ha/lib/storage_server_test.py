@@ -0,0 +1,76 @@
+import mock
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from . import storage_server
+
+
+IFACE_RECORD = """\
+# BEGIN RECORD 2.0-876
+iface.iscsi_ifacename = {name}
+iface.net_ifacename = {net}
+iface.transport_name = {transport}
+iface.vlan_id = 0
+# END RECORD
+"""
+
+
+class IscsiIfacesTest(TestCase):
+
+    def setUp(self):
+        self.ifaces_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.ifaces_dir)
+        patchers = [
+            mock.patch.object(storage_server, '_ISCSI_IFACES_DIR',
+                              self.ifaces_dir),
+            mock.patch.object(storage_server.config, 'get_cached_config'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.server = storage_server.StorageServer()
+
+    def _write_record(self, name, net, transport):
+        with open(os.path.join(self.ifaces_dir, name), 'w') as f:
+            f.write(IFACE_RECORD.format(name=name, net=net,
+                                        transport=transport))
+
+    def test_read_iface_records(self):
+        self._write_record('eth1', 'eth1', 'tcp')
+        self._write_record('unbound', '', 'tcp')
+
+        self.assertEqual(
+            sorted(self.server._read_iscsi_iface_records()),
+            [('eth1', 'eth1'), ('unbound', '<empty>')])
+
+    def test_read_iface_records_skips_other_transports(self):
+        self._write_record('eth1', 'eth1', 'tcp')
+        self._write_record('iser', 'eth2', 'iser')
+        self._write_record('bnx2i.00:11:22:33:44:55', 'eth3', 'bnx2i')
+
+        self.assertEqual(self.server._read_iscsi_iface_records(),
+                         [('eth1', 'eth1')])
+
+    def test_iface_records_used_without_iscsiadm(self):
+        self._write_record('eth1', 'eth1', 'tcp')
+
+        with mock.patch.object(self.server, '_run_iscsiadm_iface') as run:
+            ifaces = self.server._get_iscsi_ifaces()
+
+        self.assertFalse(run.called)
+        self.assertEqual(ifaces,
+                         [{'ifaceName': 'eth1', 'netIfaceName': 'eth1'}])
+
+    def test_iscsiadm_used_without_iface_records(self):
+        missing = os.path.join(self.ifaces_dir, 'missing')
+        with mock.patch.object(storage_server, '_ISCSI_IFACES_DIR', missing):
+            self.assertIsNone(self.server._read_iscsi_iface_records())
+            with mock.patch.object(self.server, '_run_iscsiadm_iface',
+                                   return_value=[('eth2', 'eth2')]) as run:
+                ifaces = self.server._get_iscsi_ifaces()
+
+        run.assert_called_once_with()
+        self.assertEqual(ifaces,
+                         [{'ifaceName': 'eth2', 'netIfaceName': 'eth2'}])
@@ -22,6 +22,7 @@ Utility functions
 """
 
 import atexit
+import ctypes
 import errno
 import glob
 import logging
@@ -52,6 +53,12 @@ _vdsm_json_rpc_lock = threading.Lock()
 VDSM_MAX_RETRY = 60
 VDSM_DELAY = 1
 
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc_pread = _libc.pread
+_libc_pread.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                        ctypes.c_size_t, ctypes.c_int64]
+_libc_pread.restype = ctypes.c_ssize_t
+
 
 def has_elapsed(start, count, end=None):
     """
@@ -174,14 +181,22 @@ def engine_status_score(status):
     raise ValueError("Invalid engine status: %r" % status)
 
 
+def new_aligned_buffer(size):
+    """Creates a file like object in shared memory.
+       MMAPped memory is always page aligned and this can be used to
+       work with direct IO files. The caller is responsible for closing
+       the buffer.
+    """
+    return mmap.mmap(-1, size, mmap.MAP_PRIVATE)
+
+
 @contextmanager
 def aligned_buffer(size):
     """Context manager that creates a file like object in shared memory.
        MMAPped memory is always page aligned and this can be used to
        work with direct IO files.
     """
-    buf = mmap.mmap(-1, size, mmap.MAP_PRIVATE)
-    with closing(buf):
+    with closing(new_aligned_buffer(size)) as buf:
         yield buf
 
 
@@ -195,6 +210,30 @@ def uninterruptible(method, *args, **kwargs):
                 raise
 
 
+def pread_into(fd, buf, offset):
+    """Read len(buf) bytes from fd at offset directly into buf.
+
+       Unlike os.pread() the data lands in the caller provided buffer,
+       so a page aligned buffer from aligned_buffer() can be used with
+       O_DIRECT files. The file position of fd is not changed.
+       Returns the number of bytes read.
+    """
+    if hasattr(os, 'preadv'):
+        return os.preadv(fd, [buf], offset)
+
+    # os.preadv is not available before python 3.7, call libc directly
+    c_buf = (ctypes.c_char * len(buf)).from_buffer(buf)
+    try:
+        read = _libc_pread(fd, c_buf, len(buf), offset)
+    finally:
+        # release the buffer export so the caller can close buf
+        del c_buf
+    if read < 0:
+        errno_ = ctypes.get_errno()
+        raise OSError(errno_, os.strerror(errno_))
+    return read
+
+
 def isOvirtNode():
     return (os.path.exists('/etc/rhev-hypervisor-release') or
             bool(glob.glob('/etc/ovirt-node-*-release')))
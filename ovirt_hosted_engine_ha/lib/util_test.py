@@ -1,6 +1,9 @@
 
+import errno
 import mock
+import os
 from six.moves import queue
+import tempfile
 import threading
 from unittest import TestCase
 
@@ -99,3 +102,38 @@ class BroadcasterTest(TestCase):
         broadcaster.close()
 
         self.assertFalse(connection.is_subscribed())
+
+
+class PreadIntoTest(TestCase):
+
+    def _without_preadv(self):
+        # os as seen on python < 3.7, which makes pread_into() use libc
+        return mock.patch.object(
+            util, 'os', mock.Mock(spec=['strerror'], strerror=os.strerror))
+
+    def _check_pread_into(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b'0123456789')
+            f.flush()
+            fd = f.fileno()
+            os.lseek(fd, 2, os.SEEK_SET)
+
+            with util.aligned_buffer(4) as buf:
+                self.assertEqual(util.pread_into(fd, buf, 5), 4)
+                self.assertEqual(buf[:], b'5678')
+
+            # the file position must not be moved
+            self.assertEqual(os.lseek(fd, 0, os.SEEK_CUR), 2)
+
+    def test_pread_into(self):
+        self._check_pread_into()
+
+    def test_pread_into_libc(self):
+        with self._without_preadv():
+            self._check_pread_into()
+
+    def test_pread_into_libc_error(self):
+        with self._without_preadv(), util.aligned_buffer(4) as buf:
+            with self.assertRaises(OSError) as cm:
+                util.pread_into(-1, buf, 0)
+        self.assertEqual(cm.exception.errno, errno.EBADF)